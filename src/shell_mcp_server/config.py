@@ -5,40 +5,225 @@ Configuration Settings for Shell MCP Server
 This module defines the settings and configuration options for the shell MCP server.
 """
 
-from pydantic_settings import BaseSettings
-from pydantic import ConfigDict
-from typing import List, Dict
+from dataclasses import InitVar, dataclass, field, fields
+from typing import Dict, Iterable, Optional, Tuple, TypeVar
+import functools
+import ntpath
 import os
+import re
+from os.path import isabs, join, normpath
 
+_T = TypeVar("_T")
 
-class Settings(BaseSettings):
+
+@functools.lru_cache(maxsize=8)
+def _compile_allowed(dirs: Tuple[str, ...]) -> "re.Pattern[str]":
+    """
+    Compile a list of directories into a single pattern.
+
+    The pattern matches a path that is one of the directories or lies beneath
+    one, so a check is a single C-level scan however long the list is.
+    """
+    if not dirs:
+        # An empty alternation would match everything; match nothing instead.
+        return re.compile(r"(?!)")
+    alternatives = "|".join(re.escape(d.rstrip(os.sep)) for d in dirs)
+    # \Z rather than $, which would also match before a trailing newline
+    return re.compile(f"(?:{alternatives})(?:{re.escape(os.sep)}|\\Z)")
+
+
+def _is_normalized(path: str) -> bool:
     """
-    Application settings class using pydantic_settings.
+    Cheaply tell whether an absolute path is already in normpath() form.
+
+    This is conservative: it may reject some normalized paths (for example
+    ones containing dotfiles), which then just take the slow path.
+    """
+    sep = os.sep
+    return (
+        sep + sep not in path
+        and sep + "." not in path
+        and not path.endswith(sep)
+        and (os.altsep is None or os.altsep not in path)
+    )
+
+
+@functools.lru_cache(maxsize=1024)
+def _check_path(path: str, cwd: str, dirs: Tuple[str, ...]) -> bool:
+    """
+    Check if a path is within any of the given directories.
+
+    Results are memoized on the full ``(path, cwd, dirs)`` key, so changing the
+    allow-list or working directory can never return a stale answer.
+    """
+    if not path or path == ".":
+        abs_path = cwd
+    elif isabs(path):
+        # Clients usually send clean absolute paths, which can be matched as-is.
+        abs_path = path if _is_normalized(path) else normpath(path)
+    else:
+        abs_path = normpath(join(cwd, path))
+    return _compile_allowed(dirs).match(abs_path) is not None
+
+
+@functools.lru_cache(maxsize=64)
+def _shell_switch(shell_path: str) -> str:
+    """
+    Return the flag that makes the shell at ``shell_path`` run a command string.
+
+    The switch depends only on the path, so it is worked out once per shell
+    rather than on every command.
+    """
+    # ntpath splits on both '/' and '\\', so Windows paths work on any host.
+    name = ntpath.basename(shell_path).lower()
+    if name.endswith(".exe"):
+        name = name[:-4]
+    if name == "cmd":
+        return "/c"
+    if name in ("powershell", "pwsh"):
+        return "-Command"
+    return "-c"
+
+
+def _parse_env_value(raw: str) -> str:
+    """Strip quotes or a trailing ``# comment`` from a dotenv value."""
+    raw = raw.strip()
+    if raw[:1] in ("'", '"'):
+        end = raw.find(raw[0], 1)
+        if end != -1:
+            return raw[1:end]
+    # Unquoted values end where whitespace is followed by '#'
+    return re.split(r"\s+#", raw, maxsplit=1)[0]
+
+
+def _read_env_file(path: str = ".env") -> Dict[str, str]:
+    """Parse ``KEY=VALUE`` lines from a dotenv file, if one exists."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            lines = f.readlines()
+    except FileNotFoundError:
+        return {}
+
+    values = {}
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#") or "=" not in line:
+            continue
+        key, _, value = line.partition("=")
+        key = key.strip()
+        if key.startswith("export "):
+            key = key[len("export "):].strip()
+        values[key] = _parse_env_value(value)
+    return values
+
+
+def _read_environment() -> Dict[str, str]:
+    """
+    Collect setting overrides from a ``.env`` file and the process environment.
+
+    Names are upper-cased, so lookups are case-insensitive as they were with
+    pydantic-settings, and the process environment wins over the file.
+    """
+    values = {key.upper(): value for key, value in _read_env_file().items()}
+    values.update((key.upper(), value) for key, value in os.environ.items())
+    return values
+
+
+def _env_field(default: _T) -> _T:
+    """Declare a setting whose default can be overridden from the environment."""
+    return field(default=default, init=False, metadata={"env": True})
+
+
+@dataclass(slots=True)
+class Settings:
+    """
+    Application settings.
 
     Attributes:
         APP_NAME (str): Name of the application
         APP_VERSION (str): Current version of the application
         COMMAND_TIMEOUT (int): Timeout for command execution in seconds
-        ALLOWED_DIRECTORIES (List[str]): List of directories where commands can be executed
+        MAX_OUTPUT_BYTES (int): Maximum bytes of stdout and of stderr kept per command
+        READ_ONLY_CACHE_TTL (float): Seconds to reuse results of read-only commands (0 disables)
+        ALLOWED_DIRECTORIES (Tuple[str, ...]): Directories where commands can be executed
         ALLOWED_SHELLS (Dict[str, str]): Dictionary of shell names to their paths
+
+    Every attribute except the directories and shells can be overridden by an
+    environment variable of the same name (matched case-insensitively), or by
+    a ``.env`` file.
     """
 
-    APP_NAME: str = "shell-mcp-server"
-    APP_VERSION: str = "0.1.0"
-    COMMAND_TIMEOUT: int = 30
-    ALLOWED_DIRECTORIES: List[str] = []
-    ALLOWED_SHELLS: Dict[str, str] = {}
+    directories: InitVar[Iterable[str]]
+    shells: InitVar[Dict[str, str]]
 
-    def __init__(self, directories: List[str], shells: Dict[str, str]):
-        super().__init__()
-        self.ALLOWED_DIRECTORIES = [os.path.abspath(d) for d in directories]
+    APP_NAME: str = _env_field("shell-mcp-server")
+    APP_VERSION: str = _env_field("0.1.0")
+    COMMAND_TIMEOUT: int = _env_field(30)
+    MAX_OUTPUT_BYTES: int = _env_field(10 * 1024 * 1024)
+    READ_ONLY_CACHE_TTL: float = _env_field(0.0)
+    ALLOWED_DIRECTORIES: Tuple[str, ...] = field(init=False)
+    ALLOWED_SHELLS: Dict[str, str] = field(init=False)
+
+    _cwd_cache: str = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self, directories: Iterable[str], shells: Dict[str, str]) -> None:
+        # Read the environment once and apply it to every overridable field,
+        # converting to the type of the field's default.
+        env = _read_environment()
+        for f in fields(self):
+            if f.metadata.get("env") and f.name in env:
+                setattr(self, f.name, type(f.default)(env[f.name]))
+
+        # The server never changes its working directory, so resolve it once
+        # instead of paying a getcwd() syscall on every permission check.
+        self._cwd_cache = cwd = os.getcwd()
+        # Absolute entries (the common case) only need normalizing; relative
+        # ones are resolved against the cached cwd rather than via abspath.
+        self.ALLOWED_DIRECTORIES = tuple(
+            normpath(d) if isabs(d) else normpath(join(cwd, d)) for d in directories
+        )
         self.ALLOWED_SHELLS = shells
 
+    @classmethod
+    def build(cls, directories: Iterable[str], shells: Dict[str, str]) -> "Settings":
+        """
+        Return a shared Settings instance for the given directories and shells.
+
+        Construction happens only once per distinct set of arguments for the
+        life of the process; later calls return the same instance. That means:
+
+        - The environment and ``.env`` file are read only on the first call;
+          later changes to them are not picked up.
+        - The instance is a process-wide singleton and must be treated as
+          read-only. Assigning to its attributes (for example
+          ``ALLOWED_DIRECTORIES``) changes it for every holder, and later
+          ``build()`` calls with the original arguments return the modified
+          object. Construct ``Settings(...)`` directly for a private copy.
+        """
+        return _build_settings(cls, tuple(directories), tuple(shells.items()))
+
+    def __setattr__(self, name: str, value) -> None:
+        if name == "ALLOWED_DIRECTORIES":
+            # Always store a tuple so it can be used directly as a cache key.
+            value = tuple(value)
+        # Zero-argument super() does not work in slotted dataclasses.
+        object.__setattr__(self, name, value)
+
+    def shell_invocation(self, shell: str) -> Optional[Tuple[str, str]]:
+        """Return the ``(path, switch)`` argv prefix for a shell, or None if it is not allowed."""
+        path = self.ALLOWED_SHELLS.get(shell)
+        if path is None:
+            return None
+        return path, _shell_switch(path)
+
     def is_path_allowed(self, path: str) -> bool:
         """Check if a path is within any of the allowed directories."""
-        abs_path = os.path.abspath(path)
-        return any(
-            abs_path.startswith(allowed_dir) for allowed_dir in self.ALLOWED_DIRECTORIES
-        )
+        return _check_path(path, self._cwd_cache, self.ALLOWED_DIRECTORIES)
+
 
-    model_config = ConfigDict(env_file=".env", env_file_encoding="utf-8")
+# Backs Settings.build(); the cached instances are shared, see its docstring
+@functools.lru_cache(maxsize=None)
+def _build_settings(
+    cls: type, directories: Tuple[str, ...], shells: Tuple[Tuple[str, str], ...]
+) -> Settings:
+    return cls(directories=list(directories), shells=dict(shells))
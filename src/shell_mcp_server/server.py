@@ -14,15 +14,24 @@ Key Features:
 """
 
 import asyncio
+import codecs
+import functools
 import os
+import signal
+import subprocess
 import sys
+import time
 import argparse
-from typing import Dict, Any, List
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
 import mcp
+import orjson
 import mcp.types as types
 from mcp.server import Server, InitializationOptions, NotificationOptions
 from .config import Settings
 
+# Whether we are running on Windows, resolved once at import
+_IS_WIN = sys.platform == 'win32'
+
 
 # Parse command line arguments for directories and shells
 def parse_args() -> tuple[List[str], Dict[str, str]]:
@@ -41,7 +50,7 @@ def parse_args() -> tuple[List[str], Dict[str, str]]:
     
     # Default to system shell if none specified
     if not shells:
-        if sys.platform == 'win32':
+        if _IS_WIN:
             shells = {'cmd': 'cmd.exe', 'powershell': 'powershell.exe'}
         else:
             shells = {'bash': '/bin/bash', 'sh': '/bin/sh'}
@@ -52,12 +61,282 @@ def parse_args() -> tuple[List[str], Dict[str, str]]:
 # Initialize server settings and create server instance - skip arg parsing for tests
 if 'pytest' not in sys.modules:
     directories, shells = parse_args()
-    settings = Settings(directories=directories, shells=shells)
+    settings = Settings.build(directories=directories, shells=shells)
 else:
-    settings = Settings(directories=['/tmp'], shells={'bash': '/bin/bash'})
+    settings = Settings.build(directories=['/tmp'], shells={'bash': '/bin/bash'})
 
 server = Server(settings.APP_NAME)
 
+# Size of each read from a command's stdout/stderr pipes
+_READ_CHUNK_SIZE = 64 * 1024
+# Seconds to wait after SIGTERM before a timed-out command is SIGKILLed
+_KILL_GRACE_PERIOD = 2
+
+# Commands that only read state, so repeating them within READ_ONLY_CACHE_TTL
+# can be answered from the result cache
+_READ_ONLY_COMMANDS = frozenset({
+    "cat", "echo", "grep", "head", "ls", "pwd", "stat", "tail", "wc", "which", "whoami",
+})
+# Characters that let a command do more than run its first word
+_SHELL_METACHARACTERS = frozenset(";&|<>$`()\r\n")
+# Maximum number of cached read-only command results
+_RESULT_CACHE_SIZE = 256
+# (shell, command, cwd) -> (time the result was produced, result)
+_result_cache: Dict[tuple[str, str, str], tuple[float, Dict[str, Any]]] = {}
+
+
+class _OutputBuffer:
+    """
+    Collect at most ``limit`` bytes of a command's output as text.
+
+    Chunks are decoded as they arrive, so the full output never exists as
+    both bytes and str. Bytes past the limit are discarded and ``truncated``
+    is set; ``text`` holds the output once ``finish()`` has been called.
+    """
+
+    def __init__(self, limit: int):
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._parts: List[str] = []
+        self._room = limit
+        self.truncated = False
+        self.text = ""
+
+    def feed(self, chunk: bytes) -> None:
+        if len(chunk) > self._room:
+            self.truncated = True
+        if self._room > 0:
+            self._parts.append(self._decoder.decode(chunk[:self._room]))
+        self._room = max(self._room - len(chunk), 0)
+
+    def finish(self) -> None:
+        # A cut at the limit may leave part of a multi-byte character in the
+        # decoder; drop it rather than flushing it out as U+FFFD.
+        if not self.truncated:
+            self._parts.append(self._decoder.decode(b"", final=True))
+        self.text = "".join(self._parts)
+
+
+async def _drain(stream: asyncio.StreamReader, limit: int) -> _OutputBuffer:
+    """
+    Read a stream until EOF, keeping at most ``limit`` bytes of it as text.
+
+    Output past the limit is still read (so the child never blocks on a full
+    pipe) but discarded.
+    """
+    output = _OutputBuffer(limit)
+    while chunk := await stream.read(_READ_CHUNK_SIZE):
+        output.feed(chunk)
+    output.finish()
+    return output
+
+
+def _read_pipe(loop: asyncio.AbstractEventLoop, fd: int, limit: int) -> "asyncio.Future[_OutputBuffer]":
+    """
+    Read a pipe until EOF straight from the loop's selector.
+
+    Returns a future for the finished output buffer, holding at most
+    ``limit`` bytes as text. The caller must remove the reader for ``fd``
+    if it abandons the future.
+    """
+    future = loop.create_future()
+    output = _OutputBuffer(limit)
+
+    def on_readable() -> None:
+        try:
+            chunk = os.read(fd, _READ_CHUNK_SIZE)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            loop.remove_reader(fd)
+            if not future.done():
+                future.set_exception(e)
+            return
+        if chunk:
+            output.feed(chunk)
+            return
+        loop.remove_reader(fd)
+        if not future.done():
+            output.finish()
+            future.set_result(output)
+
+    os.set_blocking(fd, False)
+    loop.add_reader(fd, on_readable)
+    return future
+
+
+def _signal_group(pid: int, sig: int) -> None:
+    """Send a signal to a process group, ignoring groups that are already gone."""
+    try:
+        os.killpg(pid, sig)
+    except ProcessLookupError:
+        pass
+
+
+@functools.cache
+def _pidfd_supported() -> bool:
+    """Check if the OS can hand out pidfds for child processes (Linux 5.3+)."""
+    if not hasattr(os, "pidfd_open"):
+        return False
+    try:
+        os.close(os.pidfd_open(os.getpid()))
+    except OSError:
+        return False
+    return True
+
+
+async def _terminate_group(pid: int, wait_exited: Callable[[], Awaitable[Any]]) -> None:
+    """
+    Terminate a command and everything it spawned, escalating to SIGKILL.
+
+    ``wait_exited`` must return a new awaitable each time it is called that
+    completes once the command has exited.
+    """
+    # The command runs in its own session, so its pid is also its process
+    # group id and killpg() reaches any children it started.
+    _signal_group(pid, signal.SIGTERM)
+    try:
+        async with asyncio.timeout(_KILL_GRACE_PERIOD):
+            await wait_exited()
+    except TimeoutError:
+        pass
+    _signal_group(pid, signal.SIGKILL)
+    await wait_exited()
+
+
+async def _kill_process(process: asyncio.subprocess.Process) -> None:
+    """Terminate a process and everything it spawned, escalating to SIGKILL."""
+    if _IS_WIN:
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+        await process.wait()
+        return
+
+    await _terminate_group(process.pid, process.wait)
+
+
+async def _run_with_asyncio(argv: List[str], cwd: str) -> tuple[_OutputBuffer, _OutputBuffer, int]:
+    """
+    Run a command through asyncio's subprocess API and collect its output.
+
+    Raises TimeoutError, after killing the command, if it runs longer than
+    COMMAND_TIMEOUT.
+    """
+    process = await asyncio.create_subprocess_exec(
+        *argv,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        cwd=cwd,
+        start_new_session=True
+    )
+
+    try:
+        async with asyncio.timeout(settings.COMMAND_TIMEOUT):
+            stdout, stderr = await asyncio.gather(
+                _drain(process.stdout, settings.MAX_OUTPUT_BYTES),
+                _drain(process.stderr, settings.MAX_OUTPUT_BYTES),
+            )
+            await process.wait()
+    except TimeoutError:
+        await _kill_process(process)
+        raise
+
+    return stdout, stderr, process.returncode
+
+
+async def _run_with_pidfd(argv: List[str], cwd: str) -> tuple[_OutputBuffer, _OutputBuffer, int]:
+    """
+    Run a command, reading its pipes and awaiting its exit on raw fds.
+
+    The pipes and a pidfd for the child are registered directly with the
+    event loop's selector, which skips the transports, protocols and child
+    watcher that asyncio's subprocess API sets up for every command. Raises
+    TimeoutError, after killing the command, if it runs longer than
+    COMMAND_TIMEOUT.
+    """
+    loop = asyncio.get_running_loop()
+    # os.posix_spawn() would avoid copying the parent's address space, but it
+    # has no way to set the child's working directory. Popen already spawns
+    # with vfork() + exec on Linux as long as preexec_fn and uid/gid changes
+    # are not used, which is why the new session comes from start_new_session.
+    process = subprocess.Popen(
+        argv,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        cwd=cwd,
+        start_new_session=True
+    )
+    stdout_fd = process.stdout.fileno()
+    stderr_fd = process.stderr.fileno()
+    pidfd = None
+    pipes: List["asyncio.Future[_OutputBuffer]"] = []
+    exited = loop.create_future()
+
+    def on_exit() -> None:
+        # A pidfd stays readable once the process exits, so stop watching it
+        loop.remove_reader(pidfd)
+        if not exited.done():
+            exited.set_result(None)
+
+    try:
+        pidfd = os.pidfd_open(process.pid)
+        loop.add_reader(pidfd, on_exit)
+        stdout = _read_pipe(loop, stdout_fd, settings.MAX_OUTPUT_BYTES)
+        pipes.append(stdout)
+        stderr = _read_pipe(loop, stderr_fd, settings.MAX_OUTPUT_BYTES)
+        pipes.append(stderr)
+
+        _, pending = await asyncio.wait((stdout, stderr, exited), timeout=settings.COMMAND_TIMEOUT)
+        if pending:
+            # Shield the future so the grace-period timeout can't cancel it
+            await _terminate_group(process.pid, lambda: asyncio.shield(exited))
+            process.poll()
+            raise TimeoutError
+        # The pidfd reported the exit, so this reaps without blocking
+        return stdout.result(), stderr.result(), process.poll()
+    finally:
+        if process.returncode is None:
+            if exited.done():
+                process.poll()
+            else:
+                # We were cancelled or setup failed; don't leave the command
+                # behind, and reap it off the event loop if it hasn't died yet
+                _signal_group(process.pid, signal.SIGKILL)
+                if process.poll() is None:
+                    loop.run_in_executor(None, process.wait)
+        loop.remove_reader(stdout_fd)
+        loop.remove_reader(stderr_fd)
+        if pidfd is not None:
+            loop.remove_reader(pidfd)
+            os.close(pidfd)
+        for future in (*pipes, exited):
+            future.cancel()
+        process.stdout.close()
+        process.stderr.close()
+
+
+def _is_read_only(command: str) -> bool:
+    """Check if a command is a single read-only program invocation."""
+    if not _SHELL_METACHARACTERS.isdisjoint(command):
+        return False
+    words = command.split(maxsplit=1)
+    return bool(words) and words[0] in _READ_ONLY_COMMANDS
+
+
+def _cache_result(key: tuple[str, str, str], result: Dict[str, Any]) -> None:
+    """Store a command result, evicting expired or old entries when full."""
+    now = time.monotonic()
+    _result_cache.pop(key, None)
+    if len(_result_cache) >= _RESULT_CACHE_SIZE:
+        ttl = settings.READ_ONLY_CACHE_TTL
+        for expired in [k for k, (t, _) in _result_cache.items() if now - t >= ttl]:
+            del _result_cache[expired]
+        if len(_result_cache) >= _RESULT_CACHE_SIZE:
+            # Entries are kept in insertion order, so this is the oldest
+            del _result_cache[next(iter(_result_cache))]
+    _result_cache[key] = (now, result)
+
 
 async def run_shell_command(shell: str, command: str, cwd: str) -> Dict[str, Any]:
     """
@@ -69,68 +348,58 @@ async def run_shell_command(shell: str, command: str, cwd: str) -> Dict[str, Any
         cwd (str): Working directory for command execution
         
     Returns:
-        Dict[str, Any]: Command execution results including stdout, stderr, and exit code
+        Dict[str, Any]: Command execution results including stdout, stderr, exit code,
+            and whether either stream was cut at MAX_OUTPUT_BYTES
+
+    Raises:
+        ValueError: If the directory or shell is not allowed
+        TimeoutError: If the command runs longer than COMMAND_TIMEOUT
+        OSError: If the shell cannot be started
     """
     if not settings.is_path_allowed(cwd):
         raise ValueError(f"Directory '{cwd}' is not in the allowed directories list")
     
-    if shell not in settings.ALLOWED_SHELLS:
+    invocation = settings.shell_invocation(shell)
+    if invocation is None:
         raise ValueError(f"Shell '{shell}' is not allowed. Available shells: {list(settings.ALLOWED_SHELLS.keys())}")
     
-    shell_path = settings.ALLOWED_SHELLS[shell]
-    
+    cache_key = None
+    ttl = settings.READ_ONLY_CACHE_TTL
+    if ttl > 0 and _is_read_only(command):
+        cache_key = (shell, command, cwd)
+        cached = _result_cache.get(cache_key)
+        if cached is not None and time.monotonic() - cached[0] < ttl:
+            return dict(cached[1])
+
+    shell_cmd = [*invocation, command]
+    run = _run_with_pidfd if _pidfd_supported() else _run_with_asyncio
     try:
-        if sys.platform == 'win32':
-            shell_cmd = [shell_path, '/c', command] if shell == 'cmd' else [shell_path, '-Command', command]
-        else:
-            shell_cmd = [shell_path, '-c', command]
+        stdout, stderr, exit_code = await run(shell_cmd, cwd)
+    except TimeoutError:
+        raise TimeoutError(f"Command execution timed out after {settings.COMMAND_TIMEOUT} seconds") from None
 
-        process = await asyncio.create_subprocess_exec(
-            *shell_cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-            cwd=cwd
-        )
+    result = {
+        "stdout": stdout.text,
+        "stderr": stderr.text,
+        "exit_code": exit_code,
+        "command": command,
+        "shell": shell,
+        "cwd": cwd,
+        "truncated": stdout.truncated or stderr.truncated
+    }
+    if cache_key is not None:
+        _cache_result(cache_key, dict(result))
+    return result
 
-        try:
-            stdout, stderr = await asyncio.wait_for(
-                process.communicate(), 
-                timeout=settings.COMMAND_TIMEOUT
-            )
-            
-            return {
-                "stdout": stdout.decode() if stdout else "",
-                "stderr": stderr.decode() if stderr else "",
-                "exit_code": process.returncode,
-                "command": command,
-                "shell": shell,
-                "cwd": cwd
-            }
-
-        except asyncio.TimeoutError:
-            try:
-                process.kill()
-                await process.wait()
-            except ProcessLookupError:
-                pass
-            raise TimeoutError(f"Command execution timed out after {settings.COMMAND_TIMEOUT} seconds")
-
-    except TimeoutError:
-        raise
-    except Exception as e:
-        return {
-            "stdout": "",
-            "stderr": str(e),
-            "exit_code": -1,
-            "command": command,
-            "shell": shell,
-            "cwd": cwd
-        }
 
+@functools.lru_cache(maxsize=1)
+def _build_tools(shell_names: Tuple[str, ...]) -> List[types.Tool]:
+    """
+    Build the tool definitions advertised for the given shells.
 
-@server.list_tools()
-async def list_tools() -> List[types.Tool]:
-    """List available shell tools."""
+    Memoized on the shell names, so repeated listings reuse the same
+    definitions until the allow-list changes.
+    """
     return [
         types.Tool(
             name="execute_command",
@@ -144,7 +413,7 @@ async def list_tools() -> List[types.Tool]:
                     },
                     "shell": {
                         "type": "string",
-                        "description": f"Shell to use for execution. Available: {list(settings.ALLOWED_SHELLS.keys())}",
+                        "description": f"Shell to use for execution. Available: {list(shell_names)}",
                     },
                     "cwd": {
                         "type": "string",
@@ -157,6 +426,12 @@ async def list_tools() -> List[types.Tool]:
     ]
 
 
+@server.list_tools()
+async def list_tools() -> List[types.Tool]:
+    """List available shell tools."""
+    return _build_tools(tuple(settings.ALLOWED_SHELLS))
+
+
 @server.call_tool()
 async def call_tool(name: str, arguments: Dict[str, Any]) -> List[types.TextContent]:
     """
@@ -178,7 +453,7 @@ async def call_tool(name: str, arguments: Dict[str, Any]) -> List[types.TextCont
 
     try:
         result = await run_shell_command(shell, command, cwd)
-        return [types.TextContent(type="text", text=str(result))]
+        return [types.TextContent(type="text", text=orjson.dumps(result).decode())]
     except Exception as e:
         return [types.TextContent(type="text", text=f"Error: {str(e)}")]
 
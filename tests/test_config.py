@@ -10,10 +10,38 @@ def test_settings_initialization(allowed_directories: list[str], test_shells: di
     """Test that Settings can be initialized with directories and shells."""
     settings = Settings(directories=allowed_directories, shells=test_shells)
     
-    assert settings.ALLOWED_DIRECTORIES == [os.path.abspath(d) for d in allowed_directories]
+    assert settings.ALLOWED_DIRECTORIES == tuple(os.path.abspath(d) for d in allowed_directories)
     assert settings.ALLOWED_SHELLS == test_shells
 
 
+def test_settings_build(allowed_directories: list[str], test_shells: dict[str, str]):
+    """Test that Settings.build reuses instances for identical arguments."""
+    settings = Settings.build(directories=allowed_directories, shells=test_shells)
+
+    assert settings is Settings.build(directories=allowed_directories, shells=test_shells)
+    assert settings is not Settings.build(directories=allowed_directories[:1], shells=test_shells)
+
+
+def test_shell_invocations(allowed_directories: list[str]):
+    """Test that each shell is paired with the switch that runs a command string."""
+    settings = Settings(
+        directories=allowed_directories,
+        shells={
+            "bash": "/bin/bash",
+            "cmd": "C:\\Windows\\System32\\cmd.exe",
+            "powershell": "powershell.exe",
+        },
+    )
+
+    assert settings.shell_invocation("bash") == ("/bin/bash", "-c")
+    assert settings.shell_invocation("cmd")[1] == "/c"
+    assert settings.shell_invocation("powershell") == ("powershell.exe", "-Command")
+    assert settings.shell_invocation("zsh") is None
+
+    settings.ALLOWED_SHELLS["zsh"] = "/bin/zsh"
+    assert settings.shell_invocation("zsh") == ("/bin/zsh", "-c")
+
+
 def test_is_path_allowed(allowed_directories: list[str], test_shells: dict[str, str]):
     """Test path validation."""
     settings = Settings(directories=allowed_directories, shells=test_shells)
@@ -27,6 +55,39 @@ def test_is_path_allowed(allowed_directories: list[str], test_shells: dict[str,
         assert not settings.is_path_allowed(tmpdir)
         assert not settings.is_path_allowed("/some/random/path")
 
+    # Test paths that need normalizing
+    assert settings.is_path_allowed(os.path.join(allowed_directories[0], ".", "subdir"))
+    assert settings.is_path_allowed(allowed_directories[0] + os.sep)
+    assert not settings.is_path_allowed(os.path.join(allowed_directories[0], "..", "elsewhere"))
+
+    # Test sibling directories sharing a name prefix
+    assert not settings.is_path_allowed(allowed_directories[0] + "bar")
+    assert not settings.is_path_allowed(allowed_directories[0] + "\n")
+
+
+def test_is_path_allowed_relative(allowed_directories: list[str], test_shells: dict[str, str], monkeypatch):
+    """Test that relative paths are resolved against the working directory."""
+    monkeypatch.chdir(allowed_directories[0])
+    settings = Settings(directories=allowed_directories, shells=test_shells)
+
+    assert settings.is_path_allowed("")
+    assert settings.is_path_allowed(".")
+    assert settings.is_path_allowed("subdir")
+    assert not settings.is_path_allowed("..")
+
+
+def test_is_path_allowed_after_update(allowed_directories: list[str], test_shells: dict[str, str]):
+    """Test that reassigning the allowed directories is reflected in checks."""
+    settings = Settings(directories=allowed_directories, shells=test_shells)
+    assert settings.is_path_allowed(allowed_directories[0])
+
+    settings.ALLOWED_DIRECTORIES = [allowed_directories[1]]
+    assert not settings.is_path_allowed(allowed_directories[0])
+    assert settings.is_path_allowed(allowed_directories[1])
+
+    settings.ALLOWED_DIRECTORIES = []
+    assert not settings.is_path_allowed(allowed_directories[1])
+
 
 def test_command_timeout_setting(allowed_directories: list[str], test_shells: dict[str, str]):
     """Test command timeout configuration."""
@@ -37,4 +98,22 @@ def test_command_timeout_setting(allowed_directories: list[str], test_shells: di
     os.environ["COMMAND_TIMEOUT"] = "60"
     settings = Settings(directories=allowed_directories, shells=test_shells)
     assert settings.COMMAND_TIMEOUT == 60
-    del os.environ["COMMAND_TIMEOUT"]
\ No newline at end of file
+    del os.environ["COMMAND_TIMEOUT"]
+
+
+def test_env_file_setting(allowed_directories: list[str], test_shells: dict[str, str], monkeypatch):
+    """Test that settings are read from a .env file in the working directory."""
+    monkeypatch.chdir(allowed_directories[0])
+    monkeypatch.delenv("COMMAND_TIMEOUT", raising=False)
+    with open(".env", "w") as f:
+        f.write("# comment\nCOMMAND_TIMEOUT=45  # seconds\nmax_output_bytes='100'\n")
+
+    settings = Settings(directories=allowed_directories, shells=test_shells)
+    assert settings.COMMAND_TIMEOUT == 45
+    # Names are matched case-insensitively
+    assert settings.MAX_OUTPUT_BYTES == 100
+
+    # The process environment takes precedence over the file
+    monkeypatch.setenv("COMMAND_TIMEOUT", "15")
+    settings = Settings(directories=allowed_directories, shells=test_shells)
+    assert settings.COMMAND_TIMEOUT == 15
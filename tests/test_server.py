@@ -3,7 +3,9 @@
 import os
 import pytest
 import asyncio
-from shell_mcp_server.server import run_shell_command, settings
+import json
+import shell_mcp_server.server as server_module
+from shell_mcp_server.server import call_tool, list_tools, run_shell_command, settings
 from typing import List, Dict
 
 
@@ -35,6 +37,7 @@ async def test_run_shell_command_success(allowed_directories: List[str], test_sh
     assert result["exit_code"] == 0
     assert "test content" in result["stdout"]
     assert not result["stderr"]
+    assert not result["truncated"]
 
 
 @pytest.mark.asyncio
@@ -52,6 +55,15 @@ async def test_run_shell_command_invalid_shell(allowed_directories: List[str], t
         await run_shell_command("invalid_shell", "ls", allowed_directories[0])
 
 
+@pytest.mark.asyncio
+async def test_run_shell_command_shell_removed(allowed_directories: List[str], test_shells: Dict[str, str]):
+    """Test that a shell removed from the allow-list in place is rejected."""
+    shell_name = next(iter(test_shells.keys()))
+    del settings.ALLOWED_SHELLS[shell_name]
+    with pytest.raises(ValueError, match="is not allowed"):
+        await run_shell_command(shell_name, "echo test", allowed_directories[0])
+
+
 @pytest.mark.asyncio
 async def test_run_shell_command_timeout(allowed_directories: List[str], test_shells: Dict[str, str]):
     """Test command timeout."""
@@ -124,4 +136,165 @@ async def test_command_with_arguments(allowed_directories: List[str], test_shell
     assert result["exit_code"] == 0
     assert "test0.txt" in result["stdout"]
     assert "test1.txt" in result["stdout"]
-    assert "test2.txt" in result["stdout"]
\ No newline at end of file
+    assert "test2.txt" in result["stdout"]
+
+
+@pytest.mark.asyncio
+async def test_command_output_limit(allowed_directories: List[str], test_shells: Dict[str, str], monkeypatch):
+    """Test that command output is capped at MAX_OUTPUT_BYTES."""
+    monkeypatch.setattr(settings, "MAX_OUTPUT_BYTES", 10)
+
+    shell_name = next(iter(test_shells.keys()))
+    result = await run_shell_command(shell_name, "echo " + "x" * 100, allowed_directories[0])
+
+    assert result["exit_code"] == 0
+    assert result["stdout"] == "x" * 10
+    assert result["truncated"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(os.name == 'nt', reason="printf is not available on Windows shells")
+async def test_command_output_limit_mid_character(allowed_directories: List[str], test_shells: Dict[str, str], monkeypatch):
+    """Test that a limit falling inside a multi-byte character drops the partial character."""
+    monkeypatch.setattr(settings, "MAX_OUTPUT_BYTES", 2)
+
+    shell_name = next(iter(test_shells.keys()))
+    # 'é' is two bytes in UTF-8, so the limit cuts it in half
+    result = await run_shell_command(shell_name, "printf 'a\\303\\251b'", allowed_directories[0])
+
+    assert result["stdout"] == "a"
+    assert result["truncated"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(os.name == 'nt', reason="printf is not available on Windows shells")
+async def test_command_output_invalid_utf8(allowed_directories: List[str], test_shells: Dict[str, str]):
+    """Test that undecodable output is replaced rather than raising."""
+    shell_name = next(iter(test_shells.keys()))
+    result = await run_shell_command(shell_name, "printf 'a\\377b'", allowed_directories[0])
+
+    assert result["exit_code"] == 0
+    assert result["stdout"] == "a�b"
+
+
+@pytest.mark.asyncio
+async def test_call_tool_returns_json(allowed_directories: List[str], test_shells: Dict[str, str]):
+    """Test that tool results are serialized as JSON."""
+    shell_name = next(iter(test_shells.keys()))
+    content = await call_tool(
+        "execute_command",
+        {"command": "echo test", "shell": shell_name, "cwd": allowed_directories[0]},
+    )
+
+    result = json.loads(content[0].text)
+    assert result["exit_code"] == 0
+    assert "test" in result["stdout"]
+    assert result["shell"] == shell_name
+
+
+@pytest.mark.asyncio
+async def test_list_tools_cached(test_shells: Dict[str, str]):
+    """Test that tool definitions are reused until the shells change."""
+    tools = await list_tools()
+    assert tools[0].name == "execute_command"
+    assert await list_tools() is tools
+
+    settings.ALLOWED_SHELLS = {"custom": "/bin/sh", "other": "/bin/sh"}
+    tools = await list_tools()
+    assert "custom" in tools[0].inputSchema["properties"]["shell"]["description"]
+
+    del settings.ALLOWED_SHELLS["custom"]
+    tools = await list_tools()
+    assert "custom" not in tools[0].inputSchema["properties"]["shell"]["description"]
+
+
+@pytest.mark.asyncio
+async def test_call_tool_reports_errors(allowed_directories: List[str]):
+    """Test that failures to start a shell are reported as tool errors."""
+    settings.ALLOWED_SHELLS = {"missing": os.path.join(allowed_directories[0], "no-such-shell")}
+    content = await call_tool(
+        "execute_command",
+        {"command": "echo test", "shell": "missing", "cwd": allowed_directories[0]},
+    )
+
+    assert content[0].text.startswith("Error: ")
+    assert "no-such-shell" in content[0].text
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(os.name == 'nt', reason="Read-only command names are POSIX utilities")
+async def test_read_only_command_cache(allowed_directories: List[str], test_shells: Dict[str, str], monkeypatch):
+    """Test that read-only commands are served from the cache while it is fresh."""
+    monkeypatch.setattr(settings, "READ_ONLY_CACHE_TTL", 60)
+    shell_name = next(iter(test_shells.keys()))
+    test_file = os.path.join(allowed_directories[0], "cached.txt")
+    with open(test_file, "w") as f:
+        f.write("first")
+
+    result = await run_shell_command(shell_name, "cat cached.txt", allowed_directories[0])
+    assert result["stdout"] == "first"
+
+    with open(test_file, "w") as f:
+        f.write("second")
+
+    # Identical read-only commands reuse the cached result
+    result = await run_shell_command(shell_name, "cat cached.txt", allowed_directories[0])
+    assert result["stdout"] == "first"
+
+    # Commands using shell syntax always run
+    result = await run_shell_command(shell_name, "cat cached.txt; true", allowed_directories[0])
+    assert result["stdout"] == "second"
+
+
+@pytest.mark.asyncio
+async def test_run_shell_command_without_pidfd(allowed_directories: List[str], test_shells: Dict[str, str], monkeypatch):
+    """Test the asyncio subprocess fallback used where pidfds are unavailable."""
+    monkeypatch.setattr(server_module, "_pidfd_supported", lambda: False)
+    monkeypatch.setattr(settings, "COMMAND_TIMEOUT", 1)
+    shell_name = next(iter(test_shells.keys()))
+
+    result = await run_shell_command(shell_name, "echo test", allowed_directories[0])
+    assert result["exit_code"] == 0
+    assert "test" in result["stdout"]
+
+    if os.name == 'nt':
+        command = 'timeout 10' if shell_name == 'cmd' else 'Start-Sleep 10'
+    else:
+        command = 'sleep 10'
+    with pytest.raises(TimeoutError):
+        await run_shell_command(shell_name, command, allowed_directories[0])
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(os.name == 'nt', reason="printf is not available on Windows shells")
+async def test_call_tool_large_output(allowed_directories: List[str], test_shells: Dict[str, str]):
+    """Test that large tool results are returned as one JSON text item."""
+    shell_name = next(iter(test_shells.keys()))
+    content = await call_tool(
+        "execute_command",
+        {"command": "printf '%0200000d' 0", "shell": shell_name, "cwd": allowed_directories[0]},
+    )
+
+    assert len(content) == 1
+    result = json.loads(content[0].text)
+    assert result["stdout"] == "0" * 200000
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(not os.path.isdir("/proc/self/fd"), reason="Needs /proc to count open file descriptors")
+async def test_run_shell_command_pidfd_setup_failure(allowed_directories: List[str], test_shells: Dict[str, str], monkeypatch):
+    """Test that a failure after spawning closes the pipes and stops the command."""
+    if not server_module._pidfd_supported():
+        pytest.skip("pidfds are not supported on this system")
+
+    def fail(pid: int) -> int:
+        raise OSError(24, "Too many open files")
+
+    monkeypatch.setattr(os, "pidfd_open", fail)
+    shell_name = next(iter(test_shells.keys()))
+    open_fds = len(os.listdir("/proc/self/fd"))
+
+    with pytest.raises(OSError, match="Too many open files"):
+        await run_shell_command(shell_name, "sleep 10", allowed_directories[0])
+
+    assert len(os.listdir("/proc/self/fd")) == open_fds